@@ -194,6 +194,15 @@ def parse_args(extra_args_provider=None, defaults={},
         assert args.DDP_impl == 'local'
         args.use_contiguous_buffers_in_ddp = True
 
+    # The overlapped gradient reduce hooks the parameters wrapped by the
+    # local DDP and works on param.grad.
+    if args.overlap_grad_reduce:
+        assert not args.deepspeed, \
+            '--overlap-grad-reduce is not supported with DeepSpeed'
+        assert args.DDP_impl == 'local' and \
+            not args.use_contiguous_buffers_in_ddp, \
+            '--overlap-grad-reduce requires local DDP without contiguous buffers'
+
     if args.dataloader_type is None:
         args.dataloader_type = 'single'
 
@@ -385,6 +394,11 @@ def _add_network_size_args(parser):
                        'ordering.')
     group.add_argument('--embed-layernorm', action='store_true',
                        help='use layernorm for embedding')
+    group.add_argument('--validate-embedding-ids', action='store_true',
+                       help='Check that every input id is smaller than the '
+                       'vocabulary size. In training the largest id is '
+                       'tracked on device and checked before the optimizer '
+                       'step; in evaluation every forward is checked.')
     group.add_argument('--openai-gelu', action='store_true',
                        help='Use OpenAIs GeLU implementation. This option'
                        'should not be used unless for backward compatibility'
@@ -543,6 +557,14 @@ def _add_training_args(parser):
                        help='Disable fusion of query_key_value scaling, '
                        'masking, and softmax.',
                        dest='masked_softmax_fusion')
+    group.add_argument('--masked-embedding-fusion', action='store_true',
+                       help='Fuse the vocab parallel embedding lookup and '
+                       'out-of-range masking into a single Triton kernel. '
+                       'Only used with tensor model parallelism.')
+    group.add_argument('--compile-mpu-layers', action='store_true',
+                       help='Compile the forward of the vocab parallel '
+                       'embedding and the column/row parallel linear '
+                       'layers with torch.compile and static shapes.')
     group.add_argument('--no-bias-gelu-fusion', action='store_false',
                        help='Disable bias and gelu fusion.',
                        dest='bias_gelu_fusion')
@@ -746,6 +768,10 @@ def _add_distributed_args(parser):
     group.add_argument('--use-cpu-initialization', action='store_true',
                        default=None, help='If set, affine parallel weights '
                        'initialization uses CPU' )
+    group.add_argument('--overlap-grad-reduce', action='store_true',
+                       help='Overlap the data parallel all-reduce of the '
+                       'gradients with backward. Only works with local DDP '
+                       'without contiguous buffers and without DeepSpeed.')
     return parser
 
 
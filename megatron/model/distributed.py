@@ -15,11 +15,13 @@
 
 from abc import ABC
 from abc import abstractmethod
+import weakref
 
 import torch
 from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
 
 from megatron import get_args
+from megatron import get_num_microbatches
 from megatron import mpu
 from .module import MegatronModule
 
@@ -89,9 +91,22 @@ class DistributedDataParallelBase(MegatronModule, ABC):
 class DistributedDataParallel(MegatronModule):
     """DDP with dynamic parallel strategy support."""
 
-    def __init__(self, module):
+    def __init__(self, module, accumulate_allreduce_grads_in_fp32=False,
+                 use_contiguous_buffers=False):
         super(DistributedDataParallel, self).__init__()
         self.module = module
+        self.accumulate_allreduce_grads_in_fp32 = \
+            accumulate_allreduce_grads_in_fp32
+        self.use_contiguous_buffers = use_contiguous_buffers
+        # Contiguous gradient buffers are not built, gradients are
+        # bucketed and all-reduced from param.grad.
+        self._grad_buffers = None
+
+        # Reduce every gradient as soon as it is ready during backward.
+        if get_args().overlap_grad_reduce:
+            for param in self.module.parameters():
+                if param.requires_grad:
+                    _GRAD_REDUCE_BUCKETER.register(param)
         
         # Dynamic parallel state
         self.current_tp_size = mpu.get_tensor_model_parallel_world_size()
@@ -137,6 +152,9 @@ class DistributedDataParallel(MegatronModule):
             buckets = {}
             # Pack the buckets.
             for param in self.module.parameters():
+                # Already reduced by finish_grad_reduce().
+                if getattr(param, 'grad_reduce_overlapped', False):
+                    continue
                 if param.requires_grad and param.grad is not None:
                     tp = param.data.type()
                     if tp not in buckets:
@@ -175,3 +193,110 @@ class DistributedDataParallel(MegatronModule):
         assert self._grad_buffers is not None, 'buffers are not initialized.'
         for _, buffer_ in self._grad_buffers.items():
             buffer_.zero()
+
+
+
+class GradReduceBucketer:
+    """Overlap the data parallel gradient all-reduce with backward.
+
+    Registered parameters are grouped into buckets in reverse registration
+    order, which is roughly the order their gradients become ready during
+    backward. Once every parameter of a bucket has accumulated its gradient
+    for the last microbatch of the iteration, the bucket is all-reduced
+    asynchronously. Buckets are launched in index order, a ready bucket
+    waits for the earlier ones, so that every rank issues the collectives
+    in the same sequence. `finish` must be called before the optimizer
+    step.
+    """
+
+
+    def __init__(self, bucket_numel=40000000):
+        self.bucket_numel = bucket_numel
+        self._param_refs = []
+        self._buckets = None
+        self._next_bucket = 0
+        self._pending = []
+
+
+    def register(self, param):
+        """Reduce the gradient of `param` from a post-accumulate hook."""
+        param.grad_reduce_overlapped = True
+        self._param_refs.append(weakref.ref(param))
+        param.register_post_accumulate_grad_hook(self._param_hook)
+        # Rebuild the buckets on the next backward.
+        self._buckets = None
+
+
+    def _build_buckets(self):
+        params = [ref() for ref in self._param_refs]
+        params = [param for param in params if param is not None]
+        self._param_refs = [weakref.ref(param) for param in params]
+
+        self._buckets = []
+        self._next_bucket = 0
+        bucket, numel = [], 0
+        for param in reversed(params):
+            param.grad_reduce_bucket = len(self._buckets)
+            bucket.append(param)
+            numel += param.numel()
+            if numel >= self.bucket_numel:
+                self._buckets.append({'params': bucket, 'ready': 0})
+                bucket, numel = [], 0
+        if bucket:
+            self._buckets.append({'params': bucket, 'ready': 0})
+
+
+    def _param_hook(self, param):
+        # Nothing to reduce without data parallelism.
+        if mpu.get_data_parallel_world_size() == 1:
+            return
+        if self._buckets is None:
+            self._build_buckets()
+        self._buckets[param.grad_reduce_bucket]['ready'] += 1
+        num_microbatches = get_num_microbatches()
+        while self._next_bucket < len(self._buckets):
+            bucket = self._buckets[self._next_bucket]
+            if bucket['ready'] < len(bucket['params']) * num_microbatches:
+                break
+            self._launch(bucket['params'])
+            self._next_bucket += 1
+
+
+    def _launch(self, params):
+        grads = [param.grad.data for param in params]
+        coalesced = _flatten_dense_tensors(grads)
+        coalesced /= mpu.get_data_parallel_world_size()
+        handle = torch.distributed.all_reduce(
+            coalesced, group=mpu.get_data_parallel_group(), async_op=True)
+        self._pending.append((handle, coalesced, grads))
+
+
+    def finish(self):
+        """Launch the buckets that did not fill up, wait for all the
+        all-reduces of this iteration and copy the gradients back."""
+        if self._buckets is not None:
+            if mpu.get_data_parallel_world_size() > 1:
+                for bucket in self._buckets[self._next_bucket:]:
+                    params = [param for param in bucket['params']
+                              if param.grad is not None]
+                    if params:
+                        self._launch(params)
+            for bucket in self._buckets:
+                bucket['ready'] = 0
+            self._next_bucket = 0
+        for handle, coalesced, grads in self._pending:
+            handle.wait()
+            for buf, synced in zip(grads, _unflatten_dense_tensors(
+                    coalesced, grads)):
+                buf.copy_(synced)
+        self._pending = []
+
+
+
+_GRAD_REDUCE_BUCKETER = GradReduceBucketer()
+
+
+
+def finish_grad_reduce():
+    """Wait for the overlapped gradient all-reduces of this iteration."""
+    _GRAD_REDUCE_BUCKETER.finish()
@@ -0,0 +1,91 @@
+# coding=utf-8
+# Copyright (c) 2020, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Vocab parallel embedding lookup fused with the out-of-range masking."""
+
+import torch
+
+try:
+    import triton
+    import triton.language as tl
+except ImportError:
+    triton = None
+
+
+def is_available():
+    """Return True if the fused kernel can be used."""
+    return triton is not None and torch.cuda.is_available()
+
+
+if triton is not None:
+
+    @triton.jit
+    def _masked_embedding_kernel(input_ptr, weight_ptr, output_ptr,
+                                 vocab_start, vocab_end, hidden_size,
+                                 BLOCK_SIZE: tl.constexpr):
+        row = tl.program_id(0).to(tl.int64)
+        cols = tl.program_id(1) * BLOCK_SIZE + tl.arange(0, BLOCK_SIZE)
+        col_mask = cols < hidden_size
+
+        token = tl.load(input_ptr + row).to(tl.int64)
+        in_range = (token >= vocab_start) & (token < vocab_end)
+        local_token = tl.where(in_range, token - vocab_start, 0)
+
+        # Out-of-range tokens skip the load and write zeros.
+        values = tl.load(weight_ptr + local_token * hidden_size + cols,
+                         mask=col_mask & in_range, other=0.0)
+        tl.store(output_ptr + row * hidden_size + cols, values, mask=col_mask)
+
+
+class MaskedEmbeddingFunction(torch.autograd.Function):
+    """Look up the rows of this partition's embedding and write zeros for
+    the ids that belong to other partitions, in a single pass."""
+
+    @staticmethod
+    def forward(ctx, input_, weight, vocab_start_index, vocab_end_index):
+        input_ = input_.contiguous()
+        weight_ = weight.contiguous()
+        hidden_size = weight_.size(1)
+        output = torch.empty(*input_.size(), hidden_size,
+                             dtype=weight_.dtype, device=weight_.device)
+
+        block_size = min(triton.next_power_of_2(hidden_size), 1024)
+        grid = (input_.numel(), triton.cdiv(hidden_size, block_size))
+        _masked_embedding_kernel[grid](input_, weight_, output,
+                                       vocab_start_index, vocab_end_index,
+                                       hidden_size, BLOCK_SIZE=block_size)
+
+        ctx.save_for_backward(input_)
+        ctx.vocab_start_index = vocab_start_index
+        ctx.vocab_end_index = vocab_end_index
+        ctx.num_weights = weight_.size(0)
+        return output
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        input_, = ctx.saved_tensors
+        in_range = (input_ >= ctx.vocab_start_index) & \
+                   (input_ < ctx.vocab_end_index)
+        # Out-of-range ids add a zero gradient to row 0.
+        masked_input = (input_ - ctx.vocab_start_index).masked_fill_(~in_range, 0)
+        grad_output = grad_output * in_range.unsqueeze(-1).to(grad_output.dtype)
+        grad_weight = torch.ops.aten.embedding_dense_backward(
+            grad_output, masked_input, ctx.num_weights, -1, False)
+        return None, grad_weight, None, None
+
+
+def masked_embedding(input_, weight, vocab_start_index, vocab_end_index):
+    return MaskedEmbeddingFunction.apply(input_, weight,
+                                         vocab_start_index, vocab_end_index)
@@ -23,20 +23,27 @@ import math
 import torch
 import torch.nn.functional as F
 import torch.nn.init as init
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
 from torch.nn.parameter import Parameter
 from functools import partial
 
+from .initialize import get_tensor_model_parallel_group
 from .initialize import get_tensor_model_parallel_rank
 from .initialize import get_tensor_model_parallel_world_size
 from .mappings import copy_to_tensor_model_parallel_region
 from .mappings import gather_from_tensor_model_parallel_region
 from .mappings import reduce_from_tensor_model_parallel_region
 from .mappings import scatter_to_tensor_model_parallel_region
+from .mappings import gather_from_sequence_parallel_region
+from .mappings import reduce_scatter_to_sequence_parallel_region
+from .mappings import _gather_along_first_dim
+from .mappings import _reduce_scatter_along_first_dim
 from .random import get_cuda_rng_tracker
 from .utils import divide
 from .utils import split_tensor_along_last_dim
 from .utils import VocabUtility
 from ..model.fused_layer_norm import MixedFusedLayerNorm as LayerNorm
+from ..model import fused_masked_embedding
 from megatron import get_args, mpu
 import deepspeed.runtime.activation_checkpointing.checkpointing as ds_checkpointing
 
@@ -53,30 +60,27 @@ def param_is_not_tensor_parallel_duplicate(param):
 
 
 def set_tensor_model_parallel_attributes(tensor, is_parallel, dim, stride):
-    # Make sure the attributes are not set.
-    for attribute in _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS:
-        assert not hasattr(tensor, attribute)
+    # Make sure the attributes are not set. Skipped under `python -O`.
+    if __debug__:
+        for attribute in _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS:
+            assert not hasattr(tensor, attribute)
     # Set the attributes.
-    setattr(tensor, 'tensor_model_parallel', is_parallel)
-    setattr(tensor, 'partition_dim', dim)
-    setattr(tensor, 'partition_stride', stride)
+    tensor.tensor_model_parallel = is_parallel
+    tensor.partition_dim = dim
+    tensor.partition_stride = stride
 
 
 def set_defaults_if_not_set_tensor_model_parallel_attributes(tensor):
-    def maybe_set(attribute, value):
+    for attribute, value in _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS.items():
         if not hasattr(tensor, attribute):
             setattr(tensor, attribute, value)
-    for attribute in _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS:
-        maybe_set(attribute, _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS[attribute])
 
 
 def copy_tensor_model_parallel_attributes(destination_tensor, source_tensor):
-    def maybe_copy(attribute):
+    for attribute in _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS:
         if hasattr(source_tensor, attribute):
             setattr(destination_tensor, attribute,
                     getattr(source_tensor, attribute))
-    for attribute in _MODEL_PARALLEL_ATTRIBUTE_DEFAULTS:
-        maybe_copy(attribute)
 
 
 def _initialize_affine_weight_gpu(weight, init_method,
@@ -103,7 +107,12 @@ def _initialize_affine_weight_cpu(weight, output_size, input_size,
     """Initialize affine weight for model parallel.
 
     Build the master weight on all processes and scatter
-    the relevant chunk."""
+    the relevant chunk.
+
+    Every process draws the full master weight so that the result does not
+    depend on the tensor parallel size and no communication is needed:
+    this path is also used with --lazy-mpu-init, before torch.distributed
+    is set up, and the weights live on CPU where NCCL cannot send them."""
 
     set_tensor_model_parallel_attributes(tensor=weight,
                                          is_parallel=True,
@@ -115,24 +124,76 @@ def _initialize_affine_weight_cpu(weight, output_size, input_size,
                                 dtype=torch.float,
                                 requires_grad=False)
     init_method(master_weight)
-    args = get_args()
-    master_weight = master_weight.to(dtype=args.params_dtype)
 
-    # Split and copy
+    # Select and copy. Along the partition dimension the master weight is
+    # laid out as [stride, world_size, per_partition_per_stride_size], so
+    # this rank's slices are a strided view of it.
     per_partition_per_stride_size = divide(per_partition_size, stride)
-    weight_list = torch.split(master_weight, per_partition_per_stride_size,
-                              dim=partition_dim)
     rank = get_tensor_model_parallel_rank()
     world_size = get_tensor_model_parallel_world_size()
-    my_weight_list = weight_list[rank::world_size]
+    if partition_dim == 0:
+        my_weight = master_weight.view(
+            stride, world_size, per_partition_per_stride_size, input_size)[:, rank]
+        weight_view = weight.view(stride, per_partition_per_stride_size, input_size)
+    else:
+        my_weight = master_weight.view(
+            output_size, stride, world_size, per_partition_per_stride_size)[:, :, rank]
+        weight_view = weight.view(output_size, stride, per_partition_per_stride_size)
 
     with torch.no_grad():
-        torch.cat(my_weight_list, dim=partition_dim, out=weight)
+        # Only this rank's slices are cast to the parameter dtype, the
+        # copy takes care of the conversion.
+        weight_view.copy_(my_weight)
     if return_master_weight:
-        return master_weight
+        args = get_args()
+        return master_weight.to(dtype=args.params_dtype)
     return None
 
 
+def _maybe_compile_forward(module, args):
+    """Compile `module.forward` with static shapes if requested.
+
+    The TP size, vocab range, skip_bias_add and gather_output are fixed
+    after construction, so the compiled graph specializes on them and only
+    recompiles when the input shape changes."""
+    if args.compile_mpu_layers:
+        module.forward = torch.compile(module.forward, dynamic=False)
+
+
+def check_embedding_input_ids(model):
+    """Check the input ids recorded by every VocabParallelEmbedding of
+    `model` (a module or list of modules) with --validate-embedding-ids."""
+    if not isinstance(model, list):
+        model = [model]
+    for model_module in model:
+        for module in model_module.modules():
+            if isinstance(module, VocabParallelEmbedding):
+                module.check_input_ids()
+
+
+def allreduce_sequence_parallel_grads(model):
+    """All-reduce across the tensor model parallel group the gradients of
+    the parameters tagged `sequence_parallel`. They are replicated, but each
+    rank only saw its own sequence shard, so its gradient is partial. Call
+    after the data parallel reduce and before the optimizer step."""
+    if get_tensor_model_parallel_world_size() == 1:
+        return
+    if not isinstance(model, list):
+        model = [model]
+    grads = [param.grad.data for model_module in model
+             for param in model_module.parameters()
+             if getattr(param, 'sequence_parallel', False) and
+             param.grad is not None]
+    if not grads:
+        return
+    coalesced = _flatten_dense_tensors(grads)
+    torch.distributed.all_reduce(
+        coalesced, group=get_tensor_model_parallel_group())
+    for buf, synced in zip(grads, _unflatten_dense_tensors(
+            coalesced, grads)):
+        buf.copy_(synced)
+
+
 def xavier_uniform_tensor_parallel_(tensor, gain=1., tp_degree=1):
     r"""
     This is a modified torch.nn.init.xavier_uniform_ with changes to support
@@ -153,6 +214,96 @@ def xavier_uniform_tensor_parallel_(tensor, gain=1., tp_degree=1):
     return torch.nn.init._no_grad_uniform_(tensor, -a, a)
 
 
+class _AllGatherLinearOverlap(torch.autograd.Function):
+    """All-gather a sequence parallel input and multiply it with the weight.
+
+    The local input is split into `num_chunks` chunks along the sequence
+    dimension. The all-gather of chunk k+1 is in flight while the matrix
+    multiply of chunk k runs, which hides the communication under compute.
+    """
+
+    @staticmethod
+    def forward(ctx, input_, weight, num_chunks):
+        ctx.save_for_backward(input_, weight)
+        world_size = get_tensor_model_parallel_world_size()
+        group = get_tensor_model_parallel_group()
+
+        chunks = input_.contiguous().chunk(num_chunks, dim=0)
+        chunk_size = chunks[0].size(0)
+        # Rows of the gathered input are ordered [rank, chunk, chunk_size].
+        output = input_.new_empty(world_size, num_chunks, chunk_size,
+                                  *input_.size()[1:-1], weight.size(0))
+
+        def _start_gather(k):
+            gathered = input_.new_empty(world_size * chunk_size,
+                                        *input_.size()[1:])
+            handle = torch.distributed.all_gather_into_tensor(
+                gathered, chunks[k], group=group, async_op=True)
+            return gathered, handle
+
+        pending = _start_gather(0)
+        for k in range(num_chunks):
+            gathered, handle = pending
+            handle.wait()
+            if k + 1 < num_chunks:
+                pending = _start_gather(k + 1)
+            output[:, k] = F.linear(gathered, weight).view(
+                world_size, chunk_size, *output.size()[3:])
+
+        return output.view(-1, *output.size()[3:])
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        input_, weight = ctx.saved_tensors
+        total_input = _gather_along_first_dim(input_)
+        grad_input = _reduce_scatter_along_first_dim(grad_output.matmul(weight))
+        grad_weight = grad_output.reshape(-1, grad_output.size(-1)).t().matmul(
+            total_input.reshape(-1, total_input.size(-1)))
+        return grad_input, grad_weight, None
+
+
+class _LinearReduceScatterOverlap(torch.autograd.Function):
+    """Multiply the input with the weight and reduce-scatter the result
+    along the sequence dimension.
+
+    The matrix multiply is split into `num_chunks` chunks and each chunk is
+    reduce-scattered asynchronously while the next one is computed.
+    """
+
+    @staticmethod
+    def forward(ctx, input_, weight, num_chunks):
+        ctx.save_for_backward(input_, weight)
+        world_size = get_tensor_model_parallel_world_size()
+        group = get_tensor_model_parallel_group()
+
+        chunk_size = divide(input_.size(0), world_size * num_chunks)
+        # Chunk k holds the k-th sub-block of every rank's output shard.
+        input_view = input_.contiguous().view(world_size, num_chunks, chunk_size,
+                                              *input_.size()[1:])
+        output = input_.new_empty(num_chunks, chunk_size,
+                                  *input_.size()[1:-1], weight.size(0))
+
+        handles = []
+        for k in range(num_chunks):
+            partial_output = F.linear(input_view[:, k], weight)
+            handles.append(torch.distributed.reduce_scatter_tensor(
+                output[k], partial_output, group=group, async_op=True))
+        for handle in handles:
+            handle.wait()
+
+        return output.view(-1, *output.size()[2:])
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        input_, weight = ctx.saved_tensors
+        total_grad_output = _gather_along_first_dim(grad_output)
+        grad_input = total_grad_output.matmul(weight)
+        grad_weight = total_grad_output.reshape(
+            -1, total_grad_output.size(-1)).t().matmul(
+                input_.reshape(-1, input_.size(-1)))
+        return grad_input, grad_weight, None
+
+
 class VocabParallelEmbedding(torch.nn.Module):
     """Embedding parallelized in the vocabulary dimension.
 
@@ -177,11 +328,15 @@ class VocabParallelEmbedding(torch.nn.Module):
         self.scale_grad_by_freq = False
         self.sparse = False
         self._weight = None
-        self.tensor_model_parallel_size = get_tensor_model_parallel_world_size()
+        # Boolean mask and scratch buffers reused across microbatches. Only
+        # the last input shape and device are kept.
+        self._mask_buffers_key = None
+        self._mask_buffers = None
+        args = get_args()
         
         # Initialize parallel state
         self.parallel_state = {
-            'tp_size': self.tensor_model_parallel_size,
+            'tp_size': get_tensor_model_parallel_world_size(),
             'tp_rank': get_tensor_model_parallel_rank()
         }
         
@@ -189,27 +344,37 @@ class VocabParallelEmbedding(torch.nn.Module):
         self._update_vocab_range()
         
         # Allocate weights and initialize.
-        self._initialize_weight(init_method)
+        self._initialize_weight(init_method, args)
         
-        args = get_args()
+        self.validate_embedding_ids = args.validate_embedding_ids
+        # Largest input id seen since the last check_input_ids(), kept on
+        # device so the validation does not sync on the forward path.
+        self._max_input_id = None
+        self.masked_embedding_fusion = args.masked_embedding_fusion and \
+            fused_masked_embedding.is_available()
         # Only the first stage embedding runs this class' forward
         if mpu.is_pipeline_first_stage() and (args.use_bnb_optimizer or args.embed_layernorm):
             self.norm = LayerNorm(embedding_dim)
+        else:
+            self.norm = None
+
+        _maybe_compile_forward(self, args)
 
     def _update_vocab_range(self):
         """Update vocabulary range based on current parallel state."""
+        tp_size = self.parallel_state['tp_size']
         self.vocab_start_index, self.vocab_end_index = \
             VocabUtility.vocab_range_from_global_vocab_size(
                 self.num_embeddings, 
                 self.parallel_state['tp_rank'],
-                self.parallel_state['tp_size'])
+                tp_size)
         self.num_embeddings_per_partition = self.vocab_end_index - \
             self.vocab_start_index
+        # Plain bool checked on the forward path.
+        self._is_tp = tp_size > 1
 
-    def _initialize_weight(self, init_method):
+    def _initialize_weight(self, init_method, args):
         """Initialize the weights."""
-        args = get_args()
-        
         if args.use_bnb_optimizer:
             # For BNB we use modified xavier_uniform
             init_method = partial(xavier_uniform_tensor_parallel_, 
@@ -234,6 +399,17 @@ class VocabParallelEmbedding(torch.nn.Module):
             GlobalOptimManager.get_instance().override_config(self.weight, 'optim_bits', 32)
             GlobalOptimManager.get_instance().register_parameters(self.weight)
 
+    def _get_input_mask_buffers(self, input_):
+        """Return the cached (mask, scratch) boolean buffers shaped like the
+        input, reallocating them when the shape or device changes."""
+        key = (input_.shape, input_.device)
+        if self._mask_buffers_key != key:
+            self._mask_buffers = tuple(
+                torch.empty(input_.shape, dtype=torch.bool,
+                            device=input_.device) for _ in range(2))
+            self._mask_buffers_key = key
+        return self._mask_buffers
+
     def update_parallel_state(self, tp_size=None):
         """Update parallel state and reinitialize if necessary."""
         if tp_size is not None and tp_size != self.parallel_state['tp_size']:
@@ -252,21 +428,67 @@ class VocabParallelEmbedding(torch.nn.Module):
             else:
                 init_method = init.xavier_normal_
             
-            self._initialize_weight(init_method)
+            self._initialize_weight(init_method, args)
+
+    def check_input_ids(self):
+        """Raise if an input id seen since the last call was out of range.
+
+        This syncs with the device, call it at iteration boundaries."""
+        if self._max_input_id is None:
+            return
+        max_input_id = self._max_input_id.item()
+        self._max_input_id = None
+        if max_input_id >= self.num_embeddings:
+            raise ValueError(f"There is an input id in the input that is greater than the highest possible input id.\nMax input id: {max_input_id}\nnum_embeddings: {self.num_embeddings}")
 
     def forward(self, input_):
-        if torch.any(input_ >= self.num_embeddings):
-            raise ValueError(f"There is an input id in the input that is greater than the highest possible input id.\nInput: {input_}\nnum_embeddings: {self.num_embeddings}")
-
-        if self.tensor_model_parallel_size > 1:
-            # Build the mask.
-            input_mask = (input_ < self.vocab_start_index) | \
-                        (input_ >= self.vocab_end_index)
-            # Mask the input.
-            masked_input = input_.clone() - self.vocab_start_index
-            masked_input[input_mask] = 0
+        if self.validate_embedding_ids and not self.training:
+            # Evaluation and generation have no iteration boundary to defer
+            # the check to, so check right away.
+            self._max_input_id = input_.max()
+            self.check_input_ids()
+        elif self.validate_embedding_ids:
+            # Only record the max id here, check_input_ids() inspects it.
+            if self._max_input_id is None:
+                self._max_input_id = input_.max()
+            else:
+                torch.maximum(self._max_input_id, input_.max(),
+                              out=self._max_input_id)
+
+        if self._is_tp and self.masked_embedding_fusion and input_.is_cuda:
+            # Lookup and masking in one kernel.
+            output_parallel = fused_masked_embedding.masked_embedding(
+                input_, self.weight, self.vocab_start_index,
+                self.vocab_end_index)
+            # Reduce across all the model parallel GPUs.
+            output = reduce_from_tensor_model_parallel_region(output_parallel)
         else:
-            # input_ is garanted to be in the range [0:self.vocab_end_index - self.vocab_start_index] thanks to the first check
+            output = self._embedding_forward(input_)
+
+        if self.norm is not None:
+            output = self.norm(output)
+
+        return output
+
+    def _embedding_forward(self, input_):
+        """Unfused lookup, masking and reduce."""
+        if self._is_tp:
+            # Build the mask. It is only read within this forward, so the
+            # buffers can be reused by the next microbatch. masked_input is
+            # saved by the embedding for backward and is not reused.
+            input_mask, scratch = self._get_input_mask_buffers(input_)
+            torch.lt(input_, self.vocab_start_index, out=input_mask)
+            torch.ge(input_, self.vocab_end_index, out=scratch)
+            input_mask.logical_or_(scratch)
+            # Mask the input. The shift already allocates a fresh tensor, so
+            # the out-of-range ids are zeroed in place.
+            masked_input = (input_ - self.vocab_start_index).masked_fill_(input_mask, 0)
+        elif self.validate_embedding_ids:
+            # Out-of-range ids are reported by check_input_ids(), clamp them
+            # so the lookup does not trip a device-side assert first.
+            masked_input = input_.clamp(max=self.num_embeddings - 1)
+        else:
+            # input_ is expected to be in the range [0:self.vocab_end_index - self.vocab_start_index]
             masked_input = input_
 
         # Get the embeddings.
@@ -275,15 +497,15 @@ class VocabParallelEmbedding(torch.nn.Module):
                                        self.norm_type, self.scale_grad_by_freq,
                                        self.sparse)
         # Mask the output embedding.
-        if self.tensor_model_parallel_size > 1:
-            output_parallel[input_mask, :] = 0.0
+        if self._is_tp:
+            # A broadcasted multiply is a coalesced elementwise op, unlike
+            # the boolean-indexed scatter `output_parallel[input_mask, :] = 0.0`.
+            # keep is saved for backward, so only its cast is allocated.
+            torch.logical_not(input_mask, out=scratch)
+            keep = scratch.to(output_parallel.dtype).unsqueeze(-1)
+            output_parallel = output_parallel * keep
         # Reduce across all the model parallel GPUs.
-        output = reduce_from_tensor_model_parallel_region(output_parallel)
-
-        if hasattr(self, 'norm'):
-            output = self.norm(output)
-
-        return output
+        return reduce_from_tensor_model_parallel_region(output_parallel)
 
 
 class ColumnParallelLinear(torch.nn.Module):
@@ -308,12 +530,19 @@ class ColumnParallelLinear(torch.nn.Module):
         skip_bias_add: This was added to enable performance optimizations where bias
                       can be fused with other elementwise operations. We skip
                       adding bias but instead return it.
+        sequence_parallel: If true, the input is split along the sequence
+                           (first) dimension across the tensor parallel group
+                           and is all-gathered before the matrix multiply.
+        tp_comm_overlap: If true, pipeline the sequence all-gather with the
+                         matrix multiply in `tp_comm_overlap_chunks` chunks.
+                         Only used with sequence_parallel.
     """
 
     def __init__(self, input_size, output_size, bias=True, gather_output=True,
                  init_method=init.xavier_normal_, stride=1,
                  keep_master_weight_for_test=False,
-                 skip_bias_add=False):
+                 skip_bias_add=False, sequence_parallel=False,
+                 tp_comm_overlap=False, tp_comm_overlap_chunks=4):
         super(ColumnParallelLinear, self).__init__()
 
         # Keep input parameters
@@ -322,8 +551,16 @@ class ColumnParallelLinear(torch.nn.Module):
         self.gather_output = gather_output
         self.init_method = init_method
         self.stride = stride
+        self.use_bias = bias
         self.keep_master_weight_for_test = keep_master_weight_for_test
         self.skip_bias_add = skip_bias_add
+        self.sequence_parallel = sequence_parallel
+        
+        args = get_args()
+        self.tp_comm_overlap = sequence_parallel and tp_comm_overlap
+        self.tp_comm_overlap_chunks = tp_comm_overlap_chunks
+        if self.tp_comm_overlap and tp_comm_overlap_chunks < 1:
+            raise RuntimeError("`tp_comm_overlap_chunks` must be at least 1")
         
         # Initialize parallel state
         self.parallel_state = {
@@ -335,17 +572,23 @@ class ColumnParallelLinear(torch.nn.Module):
         self._update_sizes()
         
         # Initialize parameters
-        self._initialize_weights()
+        self._initialize_weights(args)
+
+        _maybe_compile_forward(self, args)
 
     def _update_sizes(self):
         """Update sizes based on current parallel state."""
-        self.output_size_per_partition = divide(
-            self.output_size, self.parallel_state['tp_size'])
+        tp_size = self.parallel_state['tp_size']
+        self.output_size_per_partition = divide(self.output_size, tp_size)
+        # Plain bool checked on the forward path.
+        self._is_tp = tp_size > 1
 
-    def _initialize_weights(self):
+    def _initialize_weights(self, args):
         """Initialize weights and bias."""
-        args = get_args()
-        
+        # Query the device once for all the parameters.
+        device = None if args.use_cpu_initialization \
+            else torch.cuda.current_device()
+
         # Initialize weight
         if args.use_cpu_initialization:
             self.weight = Parameter(torch.empty(
@@ -359,22 +602,15 @@ class ColumnParallelLinear(torch.nn.Module):
         else:
             self.weight = Parameter(torch.empty(
                 self.output_size_per_partition, self.input_size,
-                device=torch.cuda.current_device(), dtype=args.params_dtype))
+                device=device, dtype=args.params_dtype))
             _initialize_affine_weight_gpu(self.weight, self.init_method,
                                       partition_dim=0, stride=self.stride)
         
-        if self.bias:
-            if args.use_cpu_initialization:
-                self.bias = Parameter(torch.empty(
-                    self.output_size_per_partition, dtype=args.params_dtype))
-            else:
-                self.bias = Parameter(torch.empty(
-                    self.output_size_per_partition,
-                    device=torch.cuda.current_device(),
-                    dtype=args.params_dtype))
+        if self.use_bias:
             # Always initialize bias to zero
-            with torch.no_grad():
-                self.bias.zero_()
+            self.bias = Parameter(torch.zeros(
+                self.output_size_per_partition,
+                device=device, dtype=args.params_dtype))
             set_tensor_model_parallel_attributes(self.bias, True, 0, self.stride)
         else:
             self.register_parameter('bias', None)
@@ -392,15 +628,26 @@ class ColumnParallelLinear(torch.nn.Module):
             
             # Reinitialize weights if size changed
             if old_output_size != self.output_size_per_partition:
-                self._initialize_weights()
+                self._initialize_weights(get_args())
 
     def forward(self, input_):
-        # Set up backprop all-reduce.
-        input_parallel = copy_to_tensor_model_parallel_region(input_)
-        # Matrix multiply.
-        output_parallel = F.linear(input_parallel, self.weight)
-        if self.bias is not None and not self.skip_bias_add:
-            output_parallel = output_parallel + self.bias
+        bias = self.bias if not self.skip_bias_add else None
+        if self.tp_comm_overlap and self._is_tp and \
+                input_.size(0) % self.tp_comm_overlap_chunks == 0:
+            # Pipeline the sequence all-gather with the matrix multiply.
+            output_parallel = _AllGatherLinearOverlap.apply(
+                input_, self.weight, self.tp_comm_overlap_chunks)
+            if bias is not None:
+                output_parallel = output_parallel + bias
+        else:
+            if self.sequence_parallel:
+                # All-gather the sequence shards, backprop reduce-scatter.
+                input_parallel = gather_from_sequence_parallel_region(input_)
+            else:
+                # Set up backprop all-reduce.
+                input_parallel = copy_to_tensor_model_parallel_region(input_)
+            # Matrix multiply, the bias add is fused into the GEMM epilogue.
+            output_parallel = F.linear(input_parallel, self.weight, bias)
         if self.gather_output:
             # All-gather across the partitions.
             output = gather_from_tensor_model_parallel_region(output_parallel)
@@ -438,13 +685,23 @@ class RowParallelLinear(torch.nn.Module):
         skip_bias_add: This was added to enable performance optimizations where bias
                       can be fused with other elementwise operations. We skip
                       adding bias but instead return it.
+        sequence_parallel: If true, the output is reduce-scattered along the
+                           sequence (first) dimension instead of all-reduced,
+                           for consumers that run sequence parallel. The
+                           bias is then tagged `sequence_parallel` and its
+                           gradient must be summed with
+                           allreduce_sequence_parallel_grads.
+        tp_comm_overlap: If true, pipeline the matrix multiply with the
+                         sequence reduce-scatter in `tp_comm_overlap_chunks`
+                         chunks. Only used with sequence_parallel.
     """
 
     def __init__(self, input_size, output_size, bias=True,
                  input_is_parallel=False,
                  init_method=init.xavier_normal_, stride=1,
                  keep_master_weight_for_test=False,
-                 skip_bias_add=False):
+                 skip_bias_add=False, sequence_parallel=False,
+                 tp_comm_overlap=False, tp_comm_overlap_chunks=4):
         super(RowParallelLinear, self).__init__()
 
         # Keep input parameters
@@ -453,8 +710,14 @@ class RowParallelLinear(torch.nn.Module):
         self.input_is_parallel = input_is_parallel
         self.init_method = init_method
         self.stride = stride
+        self.use_bias = bias
         self.keep_master_weight_for_test = keep_master_weight_for_test
         self.skip_bias_add = skip_bias_add
+        self.sequence_parallel = sequence_parallel
+        if self.sequence_parallel and not self.input_is_parallel:
+            raise RuntimeError("To enable `sequence_parallel`, `input_is_parallel` must be `True`")
+        
+        args = get_args()
         
         # Initialize parallel state
         self.parallel_state = {
@@ -466,20 +729,30 @@ class RowParallelLinear(torch.nn.Module):
         self._update_sizes()
         
         # Initialize parameters
-        self._initialize_weights()
+        self._initialize_weights(args)
         
-        args = get_args()
         self.bias_tp_auto_sync = args.sync_tp_duplicated_parameters
+        self.tp_comm_overlap = sequence_parallel and tp_comm_overlap
+        self.tp_comm_overlap_chunks = tp_comm_overlap_chunks
+        if self.tp_comm_overlap and tp_comm_overlap_chunks < 1:
+            raise RuntimeError("`tp_comm_overlap_chunks` must be at least 1")
+
+        _maybe_compile_forward(self, args)
 
     def _update_sizes(self):
         """Update sizes based on current parallel state."""
-        self.input_size_per_partition = divide(
-            self.input_size, self.parallel_state['tp_size'])
+        tp_size = self.parallel_state['tp_size']
+        self.input_size_per_partition = divide(self.input_size, tp_size)
+        # Plain values read on the forward path.
+        self._tp_size = tp_size
+        self._is_tp = tp_size > 1
 
-    def _initialize_weights(self):
+    def _initialize_weights(self, args):
         """Initialize weights and bias."""
-        args = get_args()
-        
+        # Query the device once for all the parameters.
+        device = None if args.use_cpu_initialization \
+            else torch.cuda.current_device()
+
         # Initialize weight
         if args.use_cpu_initialization:
             self.weight = Parameter(torch.empty(
@@ -493,21 +766,17 @@ class RowParallelLinear(torch.nn.Module):
         else:
             self.weight = Parameter(torch.empty(
                 self.output_size, self.input_size_per_partition,
-                device=torch.cuda.current_device(), dtype=args.params_dtype))
+                device=device, dtype=args.params_dtype))
             _initialize_affine_weight_gpu(self.weight, self.init_method,
                                       partition_dim=1, stride=self.stride)
         
-        if self.bias:
-            if args.use_cpu_initialization:
-                self.bias = Parameter(torch.empty(
-                    self.output_size, dtype=args.params_dtype))
-            else:
-                self.bias = Parameter(torch.empty(
-                    self.output_size, device=torch.cuda.current_device(),
-                    dtype=args.params_dtype))
+        if self.use_bias:
             # Always initialize bias to zero
-            with torch.no_grad():
-                self.bias.zero_()
+            self.bias = Parameter(torch.zeros(
+                self.output_size, device=device, dtype=args.params_dtype))
+            # Added to the local sequence shard only, see
+            # allreduce_sequence_parallel_grads.
+            self.bias.sequence_parallel = self.sequence_parallel
         else:
             self.register_parameter('bias', None)
 
@@ -524,7 +793,7 @@ class RowParallelLinear(torch.nn.Module):
             
             # Reinitialize weights if size changed
             if old_input_size != self.input_size_per_partition:
-                self._initialize_weights()
+                self._initialize_weights(get_args())
 
     def forward(self, input_):
         # Set up input tensor.
@@ -532,10 +801,21 @@ class RowParallelLinear(torch.nn.Module):
             input_parallel = input_
         else:
             input_parallel = scatter_to_tensor_model_parallel_region(input_)
-        # Matrix multiply.
-        output_parallel = F.linear(input_parallel, self.weight)
-        # All-reduce across all the partitions.
-        output_ = reduce_from_tensor_model_parallel_region(output_parallel)
+        if self.tp_comm_overlap and self._is_tp and \
+                input_parallel.size(0) % (self._tp_size * self.tp_comm_overlap_chunks) == 0:
+            # Pipeline the matrix multiply with the sequence reduce-scatter.
+            output_ = _LinearReduceScatterOverlap.apply(
+                input_parallel, self.weight, self.tp_comm_overlap_chunks)
+        elif self.sequence_parallel:
+            # Matrix multiply.
+            output_parallel = F.linear(input_parallel, self.weight)
+            # Reduce-scatter along the sequence dimension.
+            output_ = reduce_scatter_to_sequence_parallel_region(output_parallel)
+        else:
+            # Matrix multiply.
+            output_parallel = F.linear(input_parallel, self.weight)
+            # All-reduce across all the partitions.
+            output_ = reduce_from_tensor_model_parallel_region(output_parallel)
         if self.bias is not None and not self.skip_bias_add:
             output = output_ + self.bias
         else:
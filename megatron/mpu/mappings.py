@@ -59,16 +59,57 @@ def _gather(input_):
     if world_size==1:
         return input_
 
-    # Size and dimension.
-    last_dim = input_.dim() - 1
-    rank = get_tensor_model_parallel_rank()
+    # Gather into a single contiguous [world_size, *input_.size()] buffer.
+    gathered = torch.empty(world_size, *input_.size(), dtype=input_.dtype,
+                           device=input_.device)
+    torch.distributed.all_gather_into_tensor(
+        gathered, input_.contiguous(), group=get_tensor_model_parallel_group())
+
+    # Move the rank dimension next to the last one and merge them.
+    # Note: reshape of the non-contiguous view creates a contiguous tensor.
+    output = gathered.movedim(0, -2).reshape(
+        *input_.size()[:-1], world_size * input_.size(-1))
+
+    return output
+
+
+def _gather_along_first_dim(input_):
+    """Gather tensors and concatinate along the first dimension."""
+
+    world_size = get_tensor_model_parallel_world_size()
+    # Bypass the function if we are using only 1 GPU.
+    if world_size==1:
+        return input_
+
+    dim_size = list(input_.size())
+    dim_size[0] = dim_size[0] * world_size
 
-    tensor_list = [torch.empty_like(input_) for _ in range(world_size)]
-    tensor_list[rank] = input_
-    torch.distributed.all_gather(tensor_list, input_, group=get_tensor_model_parallel_group())
+    output = torch.empty(dim_size, dtype=input_.dtype,
+                         device=input_.device)
+    torch.distributed.all_gather_into_tensor(
+        output, input_.contiguous(), group=get_tensor_model_parallel_group())
 
-    # Note: torch.cat already creates a contiguous tensor.
-    output = torch.cat(tensor_list, dim=last_dim).contiguous()
+    return output
+
+
+def _reduce_scatter_along_first_dim(input_):
+    """Reduce-scatter the input tensor across model parallel group along
+    the first dimension."""
+
+    world_size = get_tensor_model_parallel_world_size()
+    # Bypass the function if we are using only 1 GPU.
+    if world_size==1:
+        return input_
+
+    dim_size = list(input_.size())
+    assert dim_size[0] % world_size == 0, \
+        'first dimension of the tensor should be divisible by tensor parallel size'
+    dim_size[0] = dim_size[0] // world_size
+
+    output = torch.empty(dim_size, dtype=input_.dtype,
+                         device=input_.device)
+    torch.distributed.reduce_scatter_tensor(
+        output, input_.contiguous(), group=get_tensor_model_parallel_group())
 
     return output
 
@@ -137,6 +178,40 @@ class _GatherFromModelParallelRegion(torch.autograd.Function):
         return _split(grad_output)
 
 
+class _GatherFromSequenceParallelRegion(torch.autograd.Function):
+    """Gather the input from sequence parallel region along the first
+    dimension. The gradient is reduce-scattered back."""
+
+    @staticmethod
+    def symbolic(graph, input_):
+        return _gather_along_first_dim(input_)
+
+    @staticmethod
+    def forward(ctx, input_):
+        return _gather_along_first_dim(input_)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        return _reduce_scatter_along_first_dim(grad_output)
+
+
+class _ReduceScatterToSequenceParallelRegion(torch.autograd.Function):
+    """Reduce-scatter the input from the model parallel region along the
+    first dimension."""
+
+    @staticmethod
+    def symbolic(graph, input_):
+        return _reduce_scatter_along_first_dim(input_)
+
+    @staticmethod
+    def forward(ctx, input_):
+        return _reduce_scatter_along_first_dim(input_)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        return _gather_along_first_dim(grad_output)
+
+
 # -----------------
 # Helper functions.
 # -----------------
@@ -155,3 +230,11 @@ def scatter_to_tensor_model_parallel_region(input_):
 
 def gather_from_tensor_model_parallel_region(input_):
     return _GatherFromModelParallelRegion.apply(input_)
+
+
+def gather_from_sequence_parallel_region(input_):
+    return _GatherFromSequenceParallelRegion.apply(input_)
+
+
+def reduce_scatter_to_sequence_parallel_region(input_):
+    return _ReduceScatterToSequenceParallelRegion.apply(input_)
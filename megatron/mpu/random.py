@@ -122,9 +122,8 @@ def gather_split_1d_tensor(tensor):
     gathered = torch.empty(numel_gathered, dtype=tensor.dtype,
                            device=torch.cuda.current_device(),
                            requires_grad=False)
-    chunks = [gathered[i*numel:(i+1)*numel] for i in range(world_size)]
-    torch.distributed.all_gather(chunks, tensor,
-                                 group=get_tensor_model_parallel_group())
+    torch.distributed.all_gather_into_tensor(
+        gathered, tensor, group=get_tensor_model_parallel_group())
     return gathered
 
 
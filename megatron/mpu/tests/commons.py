@@ -16,10 +16,17 @@
 import argparse
 import os
 import random
+import sys
 import numpy
 import torch
 
-import mpu
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                             os.path.pardir, os.path.pardir,
+                                             os.path.pardir)))
+from megatron import mpu
+from megatron import global_vars
+from megatron.arguments import parse_args
+from megatron.microbatches import build_num_microbatches_calculator
 
 
 class IdentityLayer(torch.nn.Module):
@@ -73,6 +80,24 @@ def initialize_distributed(backend='nccl'):
         init_method=init_method)
 
 
+def initialize_global_args(**overrides):
+    """Set up the global args read by the mpu layers."""
+    sys.argv = [sys.argv[0],
+                '--num-layers', '1',
+                '--hidden-size', '16',
+                '--num-attention-heads', '1',
+                '--micro-batch-size', '1',
+                '--seq-length', '16',
+                '--max-position-embeddings', '16']
+    args = parse_args(ignore_unknown_args=True)
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    global_vars._GLOBAL_ARGS = args
+    global_vars._GLOBAL_NUM_MICROBATCHES_CALCULATOR = \
+        build_num_microbatches_calculator(args)
+    return args
+
+
 def print_separator(message):
     torch.distributed.barrier()
     filler_len = (78 - len(message)) // 2
@@ -13,17 +13,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from mpu import layers
 from commons import set_random_seed
 from commons import print_separator
 from commons import initialize_distributed
-import mpu
+from commons import initialize_global_args
+from megatron import mpu
+from megatron.model import fused_masked_embedding
+from megatron.model.distributed import DistributedDataParallel as LocalDDP
+from megatron.model.distributed import GradReduceBucketer
+from megatron.mpu import layers
 from torch.nn.parameter import Parameter
+import torch.nn.functional as F
 import torch.nn.init as init
 import torch
+import copy
 import random
 import sys
-sys.path.append("../..")
 
 
 def test_parallel_embedding(tensor_model_parallel_size):
@@ -53,13 +58,6 @@ def test_parallel_embedding(tensor_model_parallel_size):
     loss_original = torch.mul(output, loss_weight).sum()
     loss_original.backward()
 
-    set_random_seed(seed)
-    embedding_parallel = layers.ParallelEmbedding(
-        vocab_size, hidden_size, init_method=init.normal_).cuda()
-    output = embedding_parallel(input_data)
-    loss_parallel = torch.mul(output, loss_weight).sum()
-    loss_parallel.backward()
-
     set_random_seed(seed)
     embedding_vocab_parallel = layers.VocabParallelEmbedding(
         vocab_size, hidden_size, init_method=init.normal_).cuda()
@@ -67,26 +65,12 @@ def test_parallel_embedding(tensor_model_parallel_size):
     loss_vocab_parallel = torch.mul(output, loss_weight).sum()
     loss_vocab_parallel.backward()
 
-    torch.distributed.barrier()
-    error = loss_parallel.sub(loss_original).abs()
-    print('   error in loss (parallel) on global rank {}: {}'.format(
-        torch.distributed.get_rank(), error))
-    assert error < 1.0e-12, 'error: {}'.format(error)
-
     torch.distributed.barrier()
     error = loss_vocab_parallel.sub(loss_original).abs()
     print('   error in loss (vocab parallel) on global rank {}: {}'.format(
         torch.distributed.get_rank(), error))
     assert error < 1.0e-12, 'error: {}'.format(error)
 
-    weight_grad_orig = torch.split(embedding_original.weight.grad,
-                                   hidden_size // tensor_model_parallel_size,
-                                   1)[mpu.get_tensor_model_parallel_rank()]
-    error = embedding_parallel.weight.grad.sub(weight_grad_orig).abs().max()
-    print('   error in grad (parallel) on global rank {}: {}'.format(
-        torch.distributed.get_rank(), error))
-    assert error < 1.0e-12, 'error: {}'.format(error)
-
     weight_grad_orig = torch.split(embedding_original.weight.grad,
                                    vocab_size // tensor_model_parallel_size,
                                    0)[mpu.get_tensor_model_parallel_rank()]
@@ -104,6 +88,73 @@ def test_parallel_embedding(tensor_model_parallel_size):
         print('>> passed the test :-)')
 
 
+def test_masked_embedding_fusion(tensor_model_parallel_size):
+
+    if not fused_masked_embedding.is_available():
+        if torch.distributed.get_rank() == 0:
+            print('> skipping masked embedding fusion test, triton is not '
+                  'available')
+        return
+
+    if torch.distributed.get_rank() == 0:
+        print('> testing masked embedding fusion with model parallel size '
+              '{} ...'.format(tensor_model_parallel_size))
+
+    mpu.initialize_model_parallel(tensor_model_parallel_size)
+    tensor_model_parallel_size = mpu.get_tensor_model_parallel_world_size()
+
+    batch_size = 17
+    seq_length = 23
+    vocab_size = 48
+    hidden_size = 16
+    seed = 1236
+
+    # With tensor parallelism some ids fall outside this rank's partition,
+    # and ids past the vocabulary fall outside every partition.
+    max_input_id = vocab_size
+    if tensor_model_parallel_size > 1:
+        max_input_id += 8
+    set_random_seed(123)
+    input_data = torch.LongTensor(
+        size=(batch_size, seq_length)).random_(0, max_input_id).cuda()
+    loss_weight = torch.randn([batch_size, seq_length, hidden_size]).cuda()
+
+    set_random_seed(seed)
+    embedding = layers.VocabParallelEmbedding(
+        vocab_size, hidden_size, init_method=init.normal_).cuda()
+
+    def run(forward):
+        embedding.weight.grad = None
+        output = forward(input_data)
+        torch.mul(output, loss_weight).sum().backward()
+        return output, embedding.weight.grad
+
+    output_unfused, grad_unfused = run(embedding._embedding_forward)
+    output_fused, grad_fused = run(
+        lambda input_: mpu.reduce_from_tensor_model_parallel_region(
+            fused_masked_embedding.masked_embedding(
+                input_, embedding.weight, embedding.vocab_start_index,
+                embedding.vocab_end_index)))
+
+    torch.distributed.barrier()
+    error = output_fused.sub(output_unfused).abs().max()
+    print('   error in output on global rank {}: {}'.format(
+        torch.distributed.get_rank(), error))
+    assert error < 1.0e-6, 'error: {}'.format(error)
+
+    error = grad_fused.sub(grad_unfused).abs().max()
+    print('   error in grad on global rank {}: {}'.format(
+        torch.distributed.get_rank(), error))
+    assert error < 1.0e-6, 'error: {}'.format(error)
+
+    # Reset groups
+    mpu.destroy_model_parallel()
+
+    torch.distributed.barrier()
+    if torch.distributed.get_rank() == 0:
+        print('>> passed the test :-)')
+
+
 def test_initialize_affine_weight(tensor_model_parallel_size):
 
     mpu.initialize_model_parallel(tensor_model_parallel_size)
@@ -114,56 +165,46 @@ def test_initialize_affine_weight(tensor_model_parallel_size):
 
     seed = 12345
     input_size_coeff = 13
-    input_size = input_size_coeff * tensor_model_parallel_size
     output_size_coeff = 17
-    output_size = output_size_coeff * tensor_model_parallel_size
-
-    # ---------------
-    # Column parallel
-    # ---------------
-    weight = torch.empty(output_size_coeff, input_size)
-    set_random_seed(seed)
-    layers._initialize_affine_weight(weight, output_size, input_size,
-
-                                     output_size_coeff, 0,
-                                     torch.nn.init.normal_)
-    # Target.
-    set_random_seed(seed)
-    master_weight = torch.empty(output_size, input_size)
-    torch.nn.init.normal_(master_weight)
     rank = mpu.get_tensor_model_parallel_rank()
-    my_weight = torch.split(master_weight, output_size_coeff,
-                            dim=0)[rank].contiguous().clone()
 
-    # Compare.
-    error = weight.sub(my_weight).abs().max()
-    torch.distributed.barrier()
-    print('   column parallel max error (should be zero) on global rank '
-          '{}: {}'.format(torch.distributed.get_rank(), error))
-    assert error < 1.0e-6
-
-    # ------------
-    # Row parallel
-    # ------------
-    weight = torch.empty(output_size, input_size_coeff)
-    set_random_seed(seed)
-    mpu.layers._initialize_affine_weight(weight, output_size, input_size,
-                                         input_size_coeff, 1,
-                                         torch.nn.init.normal_)
-    # Target.
-    set_random_seed(seed)
-    master_weight = torch.empty(output_size, input_size)
-    torch.nn.init.normal_(master_weight)
-    rank = mpu.get_tensor_model_parallel_rank()
-    my_weight = torch.split(master_weight, input_size_coeff,
-                            dim=1)[rank].contiguous().clone()
-
-    # Compare.
-    error = weight.sub(my_weight).abs().max()
-    torch.distributed.barrier()
-    print('   row parallel max error (should be zero) on global rank '
-          '{}: {}'.format(torch.distributed.get_rank(), error))
-    assert error < 1.0e-6
+    for stride in (1, 2):
+        input_size = input_size_coeff * tensor_model_parallel_size * stride
+        output_size = output_size_coeff * tensor_model_parallel_size * stride
+
+        for partition_dim, name in ((0, 'column'), (1, 'row')):
+            if partition_dim == 0:
+                per_partition_size = output_size_coeff * stride
+                weight = torch.empty(per_partition_size, input_size)
+            else:
+                per_partition_size = input_size_coeff * stride
+                weight = torch.empty(output_size, per_partition_size)
+            set_random_seed(seed)
+            layers._initialize_affine_weight_cpu(weight, output_size,
+                                                 input_size,
+                                                 per_partition_size,
+                                                 partition_dim,
+                                                 torch.nn.init.normal_,
+                                                 stride=stride)
+            # Target.
+            set_random_seed(seed)
+            master_weight = torch.empty(output_size, input_size)
+            torch.nn.init.normal_(master_weight)
+            weight_list = torch.split(master_weight,
+                                      per_partition_size // stride,
+                                      dim=partition_dim)
+            my_weight = torch.cat(
+                weight_list[rank::tensor_model_parallel_size],
+                dim=partition_dim)
+
+            # Compare.
+            error = weight.sub(my_weight).abs().max()
+            torch.distributed.barrier()
+            print('   {} parallel stride {} max error (should be zero) on '
+                  'global rank {}: {}'.format(name, stride,
+                                              torch.distributed.get_rank(),
+                                              error))
+            assert error < 1.0e-6
 
     # Reset groups
     mpu.destroy_model_parallel()
@@ -315,6 +356,55 @@ def test_row_parallel_linear(tensor_model_parallel_size):
         print(' >> passed the test :-)')
 
 
+def test_row_parallel_linear_sequence_parallel_bias(tensor_model_parallel_size):
+
+    mpu.initialize_model_parallel(tensor_model_parallel_size)
+    if torch.distributed.get_rank() == 0:
+        print('> testing sequence parallel RowParallelLinear bias with model '
+              'parallel size: {}'.format(tensor_model_parallel_size))
+    tensor_model_parallel_size = mpu.get_tensor_model_parallel_world_size()
+
+    seed = 12345
+    set_random_seed(seed)
+    input_size_coeff = 13
+    input_size = input_size_coeff * tensor_model_parallel_size
+    output_size = 17
+    seq_length = 5 * tensor_model_parallel_size
+    batch_size = 7
+
+    # Network
+    linear_layer = mpu.RowParallelLinear(
+        input_size, output_size, input_is_parallel=True,
+        sequence_parallel=True).cuda()
+    assert linear_layer.bias.sequence_parallel
+    input_ = torch.randn(seq_length, batch_size, input_size_coeff).cuda()
+    loss_weight = torch.randn([seq_length, batch_size, output_size]).cuda()
+    rank = mpu.get_tensor_model_parallel_rank()
+    my_loss_weight = torch.chunk(loss_weight, tensor_model_parallel_size,
+                                 dim=0)[rank]
+    # Forward
+    output = linear_layer(input_)
+    loss = torch.mul(output, my_loss_weight).sum()
+    # Backward
+    loss.backward()
+    mpu.allreduce_sequence_parallel_grads(linear_layer)
+
+    # Every rank holds the gradient of the whole sequence.
+    dLdb = loss_weight.sum(dim=(0, 1))
+    error = dLdb.sub(linear_layer.bias.grad).abs().max()
+    torch.distributed.barrier()
+    print('   error in dLdb on global rank {}: {}'.format(
+        torch.distributed.get_rank(), error))
+    assert error < 1.0e-5
+
+    # Reset groups
+    mpu.destroy_model_parallel()
+
+    torch.distributed.barrier()
+    if torch.distributed.get_rank() == 0:
+        print(' >> passed the test :-)')
+
+
 class IdentityLayer3D(torch.nn.Module):
     def __init__(self, m, n, k):
         super(IdentityLayer3D, self).__init__()
@@ -358,6 +448,115 @@ def parallel_self_attention(tensor_model_parallel_size, num_att_heads_per_partit
         attention_layer, identity_layer
 
 
+def test_sequence_parallel_overlap(tensor_model_parallel_size):
+
+    mpu.initialize_model_parallel(tensor_model_parallel_size)
+    if torch.distributed.get_rank() == 0:
+        print('> testing sequence parallel communication overlap with model '
+              'parallel size: {}'.format(tensor_model_parallel_size))
+    tensor_model_parallel_size = mpu.get_tensor_model_parallel_world_size()
+
+    seed = 12345
+    set_random_seed(seed)
+    num_chunks = 2
+    seq_length = 4 * num_chunks * tensor_model_parallel_size
+    batch_size = 3
+    input_size = 13
+    output_size = 17
+
+    def run(forward, input_, weight, loss_weight):
+        input_ = input_.clone().requires_grad_()
+        weight = weight.clone().requires_grad_()
+        output = forward(input_, weight)
+        torch.mul(output, loss_weight).sum().backward()
+        return output, input_.grad, weight.grad
+
+    def check(name, reference, overlapped):
+        for what, ref, val in zip(('output', 'input grad', 'weight grad'),
+                                  reference, overlapped):
+            error = val.sub(ref).abs().max()
+            torch.distributed.barrier()
+            print('   error in {} {} on global rank {}: {}'.format(
+                name, what, torch.distributed.get_rank(), error))
+            assert error < 1.0e-5
+
+    # ------------------------------------------
+    # All-gather + matrix multiply (column side)
+    # ------------------------------------------
+    input_ = torch.randn(seq_length // tensor_model_parallel_size,
+                         batch_size, input_size).cuda()
+    weight = torch.randn(output_size, input_size).cuda()
+    loss_weight = torch.randn(seq_length, batch_size, output_size).cuda()
+    reference = run(lambda x, w: F.linear(
+        mpu.gather_from_sequence_parallel_region(x), w),
+        input_, weight, loss_weight)
+    overlapped = run(lambda x, w: layers._AllGatherLinearOverlap.apply(
+        x, w, num_chunks), input_, weight, loss_weight)
+    check('all-gather linear', reference, overlapped)
+
+    # ---------------------------------------------
+    # Matrix multiply + reduce-scatter (row side)
+    # ---------------------------------------------
+    input_ = torch.randn(seq_length, batch_size, input_size).cuda()
+    weight = torch.randn(output_size, input_size).cuda()
+    loss_weight = torch.randn(seq_length // tensor_model_parallel_size,
+                              batch_size, output_size).cuda()
+    reference = run(lambda x, w: mpu.reduce_scatter_to_sequence_parallel_region(
+        F.linear(x, w)), input_, weight, loss_weight)
+    overlapped = run(lambda x, w: layers._LinearReduceScatterOverlap.apply(
+        x, w, num_chunks), input_, weight, loss_weight)
+    check('linear reduce-scatter', reference, overlapped)
+
+    # Reset groups
+    mpu.destroy_model_parallel()
+
+    torch.distributed.barrier()
+    if torch.distributed.get_rank() == 0:
+        print(' >> passed the test :-)')
+
+
+def test_grad_reduce_bucketer(tensor_model_parallel_size):
+
+    mpu.initialize_model_parallel(tensor_model_parallel_size)
+    if torch.distributed.get_rank() == 0:
+        print('> testing gradient reduce bucketer with model parallel size: '
+              '{}'.format(tensor_model_parallel_size))
+
+    set_random_seed(12345)
+    model_ref = torch.nn.Sequential(torch.nn.Linear(16, 32),
+                                    torch.nn.GELU(),
+                                    torch.nn.Linear(32, 8)).cuda()
+    model = copy.deepcopy(model_ref)
+    # Small buckets so the model spans several of them.
+    bucketer = GradReduceBucketer(bucket_numel=100)
+    for param in model.parameters():
+        bucketer.register(param)
+
+    # Different data on every data parallel rank.
+    torch.manual_seed(torch.distributed.get_rank())
+    input_ = torch.randn(4, 16).cuda()
+
+    model_ref(input_).sum().backward()
+    LocalDDP(model_ref).allreduce_gradients()
+
+    model(input_).sum().backward()
+    bucketer.finish()
+
+    for param_ref, param in zip(model_ref.parameters(), model.parameters()):
+        error = param.grad.sub(param_ref.grad).abs().max()
+        torch.distributed.barrier()
+        print('   error in grad on global rank {}: {}'.format(
+            torch.distributed.get_rank(), error))
+        assert error < 1.0e-6, 'error: {}'.format(error)
+
+    # Reset groups
+    mpu.destroy_model_parallel()
+
+    torch.distributed.barrier()
+    if torch.distributed.get_rank() == 0:
+        print(' >> passed the test :-)')
+
+
 def test_parallel_self_attention(tensor_model_parallel_size):
 
     if torch.distributed.get_rank() == 0:
@@ -491,6 +690,10 @@ if __name__ == '__main__':
     torch.backends.cudnn.benchmark = False
 
     initialize_distributed()
+    # The layers read the global args. CPU initialization draws the same
+    # master weights as the unpartitioned references and keeps them for
+    # keep_master_weight_for_test.
+    initialize_global_args(use_cpu_initialization=True)
     world_size = torch.distributed.get_world_size()
 
     print_separator('test initialize affine weight')
@@ -505,6 +708,12 @@ if __name__ == '__main__':
         test_parallel_embedding(tensor_model_parallel_size)
         tensor_model_parallel_size *= 2
 
+    tensor_model_parallel_size = 1
+    while tensor_model_parallel_size <= world_size:
+        print_separator('test masked embedding fusion')
+        test_masked_embedding_fusion(tensor_model_parallel_size)
+        tensor_model_parallel_size *= 2
+
     print_separator('test column-parallel linear')
     tensor_model_parallel_size = 1
     while tensor_model_parallel_size <= world_size:
@@ -517,6 +726,25 @@ if __name__ == '__main__':
         test_row_parallel_linear(tensor_model_parallel_size)
         tensor_model_parallel_size *= 2
 
+    print_separator('test sequence parallel row-parallel bias')
+    tensor_model_parallel_size = 1
+    while tensor_model_parallel_size <= world_size:
+        test_row_parallel_linear_sequence_parallel_bias(
+            tensor_model_parallel_size)
+        tensor_model_parallel_size *= 2
+
+    print_separator('test sequence parallel overlap')
+    tensor_model_parallel_size = 1
+    while tensor_model_parallel_size <= world_size:
+        test_sequence_parallel_overlap(tensor_model_parallel_size)
+        tensor_model_parallel_size *= 2
+
+    print_separator('test gradient reduce bucketer')
+    tensor_model_parallel_size = 1
+    while tensor_model_parallel_size <= world_size:
+        test_grad_reduce_bucketer(tensor_model_parallel_size)
+        tensor_model_parallel_size *= 2
+
     print_separator('test parallel self-attention')
     tensor_model_parallel_size = 1
     while tensor_model_parallel_size <= world_size:
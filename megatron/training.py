@@ -30,6 +30,7 @@ from megatron.initialize import initialize_megatron
 from megatron.initialize import write_args_to_tensorboard, log_restart_to_tensorboard
 from megatron.learning_rates import AnnealingLR
 from megatron.model.distributed import DistributedDataParallel as LocalDDP
+from megatron.model.distributed import finish_grad_reduce
 from megatron.utils import check_adlr_autoresume_termination, get_parameters_in_billions
 from megatron.utils import unwrap_model, found_kill_switch
 from megatron.data.data_samplers import build_pretraining_data_loader
@@ -428,6 +429,23 @@ def train_step(forward_step_func, data_iterator,
         optimizer, timers, forward_only=False)
     timers('forward-backward').stop()
 
+    # Wait for the gradient all-reduces overlapped with backward, then
+    # reduce the parameters that were not registered for the overlap.
+    if args.overlap_grad_reduce:
+        timers('backward-params-all-reduce').start()
+        finish_grad_reduce()
+        for model_module in model:
+            if isinstance(model_module, LocalDDP):
+                model_module.allreduce_gradients()
+        timers('backward-params-all-reduce').stop()
+
+    # Sum the partial gradients of the sequence parallel parameters.
+    mpu.allreduce_sequence_parallel_grads(model)
+
+    # Reject out-of-range input ids before they reach the weights.
+    if args.validate_embedding_ids:
+        mpu.check_embedding_input_ids(model)
+
     # Update parameters
     timers('optimizer').start()
     update_successful, grad_norm, num_zeros_in_grad = optimizer.step()